@@ -1,7 +1,8 @@
 from functools import cache
 
-from aqt import mw
+import httpx
 from google import genai
+from google.genai.errors import APIError
 from pydantic import BaseModel, Field
 
 from ..enums import SpeachPart
@@ -10,6 +11,12 @@ from .prompt_utils import load_prompt_template_from_file, replace_promt_placehol
 GOOGLE_MODEL = "gemini-2.5-flash"
 
 
+class AIUnavailableError(Exception):
+    """
+    Quota is exceeded, the service is down or there is no network. Request can be retried later.
+    """
+
+
 class Synonym(BaseModel):
     word: str = Field(description="The synonym word.")
     difference: str = Field(
@@ -29,23 +36,37 @@ class ExplainWordResponse(BaseModel):
     )
 
 
-def explain_word_with_ai(word: str, part_of_speech: SpeachPart | None) -> ExplainWordResponse:
+def explain_word_with_ai(
+    word: str,
+    part_of_speech: SpeachPart | None,
+    api_key: str,
+    usage_examples_needed: bool = True,
+) -> ExplainWordResponse:
     explain_word_prompt_template = get_explain_word_prompt()
     explain_word_prompt_params = {
         "word": word,
         "part_of_speech": part_of_speech.value if part_of_speech else "undefined",
+        "usage_examples_needed": "ja" if usage_examples_needed else "nein",
     }
     explain_word_prompt = explain_word_prompt_template % explain_word_prompt_params
 
-    response = get_genai_client().models.generate_content(
-        model=GOOGLE_MODEL,
-        config=genai.types.GenerateContentConfig(
-            response_mime_type="application/json",
-            response_json_schema=ExplainWordResponse.model_json_schema(),
-            temperature=0.7,
-        ),
-        contents=explain_word_prompt,
-    )
+    try:
+        response = get_genai_client(api_key).models.generate_content(
+            model=GOOGLE_MODEL,
+            config=genai.types.GenerateContentConfig(
+                response_mime_type="application/json",
+                response_json_schema=ExplainWordResponse.model_json_schema(),
+                temperature=0.7,
+            ),
+            contents=explain_word_prompt,
+        )
+    except APIError as e:
+        # 429 - quota is exceeded.
+        if e.code == 429 or e.code >= 500:
+            raise AIUnavailableError(str(e)) from e
+        raise
+    except httpx.TransportError as e:
+        raise AIUnavailableError(str(e)) from e
 
     generate_sentence_response = ExplainWordResponse.model_validate_json(response.text or "")
     return generate_sentence_response
@@ -57,12 +78,7 @@ def get_explain_word_prompt() -> str:
 
 
 @cache
-def get_genai_client() -> genai.Client:
-    config = mw.addonManager.getConfig(__name__)
-    if config is None:
-        raise ValueError("Config is not available")
-
-    api_key = config.get("GENAI_API_KEY", "")
+def get_genai_client(api_key: str) -> genai.Client:
     if not api_key:
         raise ValueError("GenAI API key is not set in the addon configuration")
     client = genai.Client(api_key=api_key)
@@ -0,0 +1,179 @@
+"""
+Generate cards for a list of words without Anki:
+
+    GENAI_API_KEY=... python -m addon.cli words.txt --output-dir cards --concurrency 4
+
+Progress is appended to `checkpoint.jsonl` in the output folder, so a rerun of an
+interrupted batch only processes the words that are missing there. On Ctrl+C queued words
+are cancelled, words in progress are finished and saved. Press Ctrl+C again to stop at once.
+
+`--format anki` writes a tab separated file with Anki import headers. Copy files from
+`media/` into the `collection.media` folder of the profile before importing it.
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from dataclasses import asdict
+from typing import Any
+
+from . import wiktionary
+from .examples_index import DEFAULT_INDEX_PATH, ExamplesIndex
+from .word_card import build_word_card
+
+CHECKPOINT_FILE_NAME = "checkpoint.jsonl"
+MEDIA_FOLDER_NAME = "media"
+NOTE_FIELDS = ["Front", "Back", "Info", "Example"]
+
+type CardRecord = dict[str, Any]
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Generate Anki cards for German words.")
+    parser.add_argument("words_file", help="Text file with one word per line.")
+    parser.add_argument("--output-dir", default="cards")
+    parser.add_argument("--format", choices=["csv", "anki"], default="csv")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--api-key", default=os.environ.get("GENAI_API_KEY", ""))
+    parser.add_argument("--examples-index", default=DEFAULT_INDEX_PATH)
+    args = parser.parse_args(argv)
+    if not args.api_key:
+        parser.error("GenAI API key is not set. Use --api-key or GENAI_API_KEY variable.")
+
+    media_dir = os.path.join(args.output_dir, MEDIA_FOLDER_NAME)
+    os.makedirs(media_dir, exist_ok=True)
+    checkpoint_path = os.path.join(args.output_dir, CHECKPOINT_FILE_NAME)
+    examples_index = ExamplesIndex(args.examples_index)
+
+    words = read_words(args.words_file)
+    records = load_checkpoint(checkpoint_path)
+    pending_words = [word for word in words if word not in records]
+    print(f"{len(words) - len(pending_words)} of {len(words)} words are already processed")
+
+    interrupted = False
+    failed_words: list[str] = []
+    handled_futures: set[Future[CardRecord]] = set()
+    executor = ThreadPoolExecutor(max_workers=args.concurrency)
+    with open(checkpoint_path, "a", encoding="utf-8") as checkpoint_file:
+
+        def save_result(future: Future[CardRecord], word: str) -> None:
+            handled_futures.add(future)
+            try:
+                record = future.result()
+            except Exception as e:
+                print(f"Failed: {word}: {e}", file=sys.stderr)
+                failed_words.append(word)
+                return
+
+            records[word] = record
+            checkpoint_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            checkpoint_file.flush()
+            print(f"Done: {word}")
+
+        futures = {
+            executor.submit(process_word, word, args.api_key, examples_index, media_dir): word
+            for word in pending_words
+        }
+        try:
+            for future in as_completed(futures):
+                save_result(future, futures[future])
+        except KeyboardInterrupt:
+            interrupted = True
+            print("Interrupted, finishing words in progress", file=sys.stderr)
+            # Do not start queued words. Words in progress are already paid for, so save them.
+            in_progress = [
+                future
+                for future in futures
+                if future not in handled_futures and not future.cancel()
+            ]
+            try:
+                for future in as_completed(in_progress):
+                    save_result(future, futures[future])
+            except KeyboardInterrupt:
+                print("Stopped without saving words in progress", file=sys.stderr)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    output_path = write_output(
+        [records[word] for word in words if word in records], args.output_dir, args.format
+    )
+    print(f"Cards are written to {output_path}")
+
+    if interrupted:
+        print("Interrupted, run again to continue", file=sys.stderr)
+        return 130
+    if failed_words:
+        print(f"{len(failed_words)} words failed, run again to retry them", file=sys.stderr)
+        return 1
+    return 0
+
+
+def read_words(file_path: str) -> list[str]:
+    with open(file_path, "r", encoding="utf-8") as f:
+        lines = [line.strip() for line in f]
+    # Keep the order of the file, but skip duplicates.
+    return list(dict.fromkeys(line for line in lines if line and not line.startswith("#")))
+
+
+def load_checkpoint(checkpoint_path: str) -> dict[str, CardRecord]:
+    records: dict[str, CardRecord] = {}
+    if not os.path.exists(checkpoint_path):
+        return records
+
+    with open(checkpoint_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Last line can be cut if the run was killed during write.
+                continue
+            records[record["word"]] = record
+    return records
+
+
+def process_word(
+    word: str, api_key: str, examples_index: ExamplesIndex, media_dir: str
+) -> CardRecord:
+    word_card = build_word_card(word, api_key, examples_index)
+    record: CardRecord = asdict(word_card)
+
+    record["audio_file"] = None
+    if word_card.audio_url:
+        audio_file = wiktionary.get_file_name_from_url(word_card.audio_url)
+        wiktionary.download_file(word_card.audio_url, os.path.join(media_dir, audio_file))
+        record["audio_file"] = audio_file
+
+    return record
+
+
+def record_to_note_fields(record: CardRecord) -> list[str]:
+    front = record["front"]
+    if record["audio_file"]:
+        front += f"<br>[sound:{record['audio_file']}]"
+    return [front, record["back"], record["info"] or "", record["example"]]
+
+
+def write_output(records: list[CardRecord], output_dir: str, output_format: str) -> str:
+    if output_format == "anki":
+        output_path = os.path.join(output_dir, "cards.txt")
+        with open(output_path, "w", encoding="utf-8", newline="") as f:
+            # https://docs.ankiweb.net/importing/text-files.html#file-headers
+            f.write("#separator:tab\n#html:true\n")
+            f.write("#columns:" + "\t".join(NOTE_FIELDS) + "\n")
+            writer = csv.writer(f, delimiter="\t")
+            writer.writerows(record_to_note_fields(record) for record in records)
+        return output_path
+
+    output_path = os.path.join(output_dir, "cards.csv")
+    with open(output_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(NOTE_FIELDS)
+        writer.writerows(record_to_note_fields(record) for record in records)
+    return output_path
+
+
+if __name__ == "__main__":
+    sys.exit(main())
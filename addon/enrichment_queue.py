@@ -0,0 +1,185 @@
+"""
+Durable queue of notes which still need AI or audio enrichment.
+
+Jobs are added when Gemini quota is exceeded or there is no network, and are drained later
+by `enrichment_worker`. Each Anki profile has its own SQLite file in `user_files`, so jobs
+survive restarts and note ids of one profile are never looked up in another.
+"""
+
+import json
+import os
+import sqlite3
+import time
+from contextlib import closing
+from dataclasses import dataclass
+from functools import cache
+from typing import Iterable
+
+from .enums import EnrichmentKind
+
+USER_FILES_PATH = os.path.join(os.path.dirname(__file__), "user_files")
+
+# Retry delay doubles after every failed attempt.
+BASE_RETRY_DELAY = 60
+MAX_RETRY_DELAY = 60 * 60
+
+PENDING = "PENDING"
+RUNNING = "RUNNING"
+FAILED = "FAILED"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    note_id INTEGER NOT NULL,
+    word TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    -- Field values written when the job was added. Used to detect user edits.
+    base_fields TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    UNIQUE (note_id, kind)
+);
+CREATE INDEX IF NOT EXISTS jobs_due ON jobs (status, next_attempt_at);
+"""
+
+
+@dataclass
+class EnrichmentJob:
+    id: int
+    note_id: int
+    word: str
+    kind: EnrichmentKind
+    base_fields: dict[str, str]
+    attempts: int
+
+
+class EnrichmentQueue:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with closing(self._connect()) as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def add(
+        self, note_id: int, word: str, kind: EnrichmentKind, base_fields: dict[str, str]
+    ) -> None:
+        """
+        Add a job. A job of the same kind for the note is replaced.
+
+        The first attempt is delayed: the service has just failed, and the editor
+        has time to save the note before the worker compares its fields.
+        """
+        with closing(self._connect()) as connection, connection:
+            connection.execute(
+                """
+                INSERT OR REPLACE INTO jobs
+                    (note_id, word, kind, base_fields, status, attempts, next_attempt_at)
+                VALUES (?, ?, ?, ?, ?, 0, ?)
+                """,
+                (
+                    note_id,
+                    word,
+                    kind.value,
+                    json.dumps(base_fields),
+                    PENDING,
+                    time.time() + BASE_RETRY_DELAY,
+                ),
+            )
+
+    def claim_due_jobs(
+        self, limit: int, kinds: Iterable[EnrichmentKind] = tuple(EnrichmentKind)
+    ) -> list[EnrichmentJob]:
+        kind_values = [kind.value for kind in kinds]
+        placeholders = ", ".join("?" * len(kind_values))
+        with closing(self._connect()) as connection, connection:
+            rows = connection.execute(
+                f"""
+                SELECT id, note_id, word, kind, base_fields, attempts FROM jobs
+                WHERE status = ? AND next_attempt_at <= ? AND kind IN ({placeholders})
+                ORDER BY next_attempt_at
+                LIMIT ?
+                """,
+                (PENDING, time.time(), *kind_values, limit),
+            ).fetchall()
+            connection.executemany(
+                "UPDATE jobs SET status = ? WHERE id = ?", [(RUNNING, row[0]) for row in rows]
+            )
+
+        return [
+            EnrichmentJob(
+                id=job_id,
+                note_id=note_id,
+                word=word,
+                kind=EnrichmentKind(kind),
+                base_fields=json.loads(base_fields),
+                attempts=attempts,
+            )
+            for job_id, note_id, word, kind, base_fields, attempts in rows
+        ]
+
+    def complete(self, job_id: int) -> None:
+        with closing(self._connect()) as connection, connection:
+            connection.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def retry_later(self, job_id: int, error: str) -> float:
+        """
+        Put the job back with exponential backoff. Return the delay in seconds.
+        """
+        with closing(self._connect()) as connection, connection:
+            row = connection.execute("SELECT attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                # Job was replaced by a new one for the same note.
+                return 0.0
+            (attempts,) = row
+            delay = float(min(MAX_RETRY_DELAY, BASE_RETRY_DELAY * 2**attempts))
+            connection.execute(
+                """
+                UPDATE jobs SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ?
+                WHERE id = ?
+                """,
+                (PENDING, attempts + 1, time.time() + delay, error, job_id),
+            )
+        return delay
+
+    def fail(self, job_id: int, error: str) -> None:
+        """
+        Keep the job for inspection, but do not retry it.
+        """
+        with closing(self._connect()) as connection, connection:
+            connection.execute(
+                "UPDATE jobs SET status = ?, last_error = ? WHERE id = ?",
+                (FAILED, error, job_id),
+            )
+
+    def release_running_jobs(self) -> None:
+        """
+        Return jobs interrupted by Anki exit back to the queue.
+        """
+        with closing(self._connect()) as connection, connection:
+            connection.execute("UPDATE jobs SET status = ? WHERE status = ?", (PENDING, RUNNING))
+
+
+@cache
+def get_enrichment_queue(profile_name: str) -> EnrichmentQueue:
+    # Profile names are folder names in Anki, so they are safe to use in a file name.
+    return EnrichmentQueue(os.path.join(USER_FILES_PATH, f"enrichment_queue_{profile_name}.sqlite"))
+
+
+def merge_fields(
+    current_fields: dict[str, str], base_fields: dict[str, str], enriched_fields: dict[str, str]
+) -> dict[str, str]:
+    """
+    Return enriched fields which can be written to the note. A field is skipped if the user
+    changed it after the job was added, or if it was not written by the add-on.
+    """
+    return {
+        field: value
+        for field, value in enriched_fields.items()
+        if field in base_fields and current_fields.get(field) == base_fields[field]
+    }
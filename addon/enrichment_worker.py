@@ -0,0 +1,194 @@
+"""
+Background worker which drains the enrichment queue while Anki profile is open.
+"""
+
+import time
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Any
+
+import requests
+from anki.errors import NotFoundError
+from anki.notes import NoteId
+from aqt import gui_hooks, mw
+from aqt.operations.note import update_note
+
+from . import wiktionary
+from .ai.explain_word import AIUnavailableError
+from .enrichment_queue import EnrichmentJob, EnrichmentQueue, get_enrichment_queue, merge_fields
+from .enums import EnrichmentKind
+from .examples_index import get_examples_index
+from .word_card import explain_entry, load_wiktionary_entry, render_word_card
+
+POLL_INTERVAL_MS = 30_000
+DEFAULT_CONCURRENCY = 2
+
+# Errors which can go away by themselves: quota, service or network is not available.
+RETRYABLE_ERRORS = (AIUnavailableError, requests.RequestException)
+
+# Jobs which call AI. They are paused while AI quota is exceeded.
+AI_KINDS = (EnrichmentKind.AI, EnrichmentKind.CARD)
+
+
+@dataclass
+class EnrichmentResult:
+    fields: dict[str, str] = field(default_factory=dict)
+    audio_file_name: str | None = None
+    audio_data: bytes | None = None
+    # Audio download failed after the card was generated. It is retried as a separate job,
+    # so AI is not called again.
+    audio_deferred: bool = False
+
+
+class EnrichmentWorker:
+    def __init__(self, queue: EnrichmentQueue) -> None:
+        self.queue = queue
+        self.running_jobs = 0
+        # Set when AI quota is exceeded, so AI jobs are not claimed only to fail again.
+        self.ai_paused_until = 0.0
+        self.timer: Any = None
+
+    def start(self) -> None:
+        self.queue.release_running_jobs()
+        self.timer = mw.progress.timer(POLL_INTERVAL_MS, self.drain, True, parent=mw)
+        self.drain()
+
+    def stop(self) -> None:
+        if self.timer:
+            self.timer.stop()
+            self.timer = None
+
+    def drain(self) -> None:
+        if mw.col is None or self.timer is None:
+            return
+
+        # Config is read on every drain, so changes are used without restarting Anki.
+        config = mw.addonManager.getConfig(__name__) or {}
+        genai_api_key = config.get("GENAI_API_KEY", "")
+        concurrency = max(1, int(config.get("ENRICHMENT_CONCURRENCY", DEFAULT_CONCURRENCY)))
+
+        free_slots = concurrency - self.running_jobs
+        if free_slots <= 0:
+            return
+
+        kinds = list(EnrichmentKind)
+        if not genai_api_key or time.time() < self.ai_paused_until:
+            # AI jobs wait in the queue until the key is set or the quota is available.
+            kinds = [kind for kind in kinds if kind not in AI_KINDS]
+
+        for job in self.queue.claim_due_jobs(free_slots, kinds):
+            self.running_jobs += 1
+            # Jobs do not use the collection, so they run in parallel and do not block Anki.
+            # Results are applied in `_on_enriched` on the main thread.
+            mw.taskman.run_in_background(
+                partial(self._enrich, job, genai_api_key),
+                partial(self._on_enriched, job),
+                uses_collection=False,
+            )
+
+    def _enrich(self, job: EnrichmentJob, genai_api_key: str) -> EnrichmentResult:
+        """
+        Runs in a background thread, so it does not touch the collection.
+        """
+        if job.kind == EnrichmentKind.AI:
+            entry = load_wiktionary_entry(job.word, get_examples_index())
+            word_card = render_word_card(entry, explain_entry(entry, genai_api_key))
+            return EnrichmentResult(fields={"Back": word_card.back, "Example": word_card.example})
+
+        if job.kind == EnrichmentKind.CARD:
+            entry = load_wiktionary_entry(job.word, get_examples_index())
+            word_card = render_word_card(entry, explain_entry(entry, genai_api_key))
+            result = EnrichmentResult(
+                fields={
+                    "Front": word_card.front,
+                    "Back": word_card.back,
+                    "Example": word_card.example,
+                }
+            )
+            if word_card.info:
+                result.fields["Info"] = word_card.info
+            try:
+                self._download_audio(result, entry.wikitext)
+            except requests.RequestException:
+                result.audio_deferred = True
+            return result
+
+        entry = load_wiktionary_entry(job.word)
+        result = EnrichmentResult()
+        self._download_audio(result, entry.wikitext)
+        return result
+
+    def _download_audio(self, result: EnrichmentResult, wikitext: str) -> None:
+        audio_url = wiktionary.get_audio_url_from_wikitext(wikitext)
+        if audio_url:
+            result.audio_file_name = wiktionary.get_file_name_from_url(audio_url)
+            result.audio_data = wiktionary.get_file_data(audio_url)
+
+    def _on_enriched(self, job: EnrichmentJob, future: Any) -> None:
+        self.running_jobs -= 1
+        if self.timer is None or mw.col is None:
+            # Worker was stopped, the profile can be closed or another one opened.
+            # The job is left running and is released when its profile is opened again.
+            return
+
+        try:
+            result: EnrichmentResult = future.result()
+        except RETRYABLE_ERRORS as e:
+            delay = self.queue.retry_later(job.id, str(e))
+            if isinstance(e, AIUnavailableError):
+                self.ai_paused_until = time.time() + delay
+            return
+        except Exception as e:
+            self.queue.fail(job.id, str(e))
+            return
+
+        try:
+            self._apply_result(job, result)
+        except Exception as e:
+            self.queue.fail(job.id, str(e))
+            return
+
+        self.queue.complete(job.id)
+        if result.audio_deferred:
+            self.queue.add(job.note_id, job.word, EnrichmentKind.AUDIO, {})
+        self.drain()
+
+    def _apply_result(self, job: EnrichmentJob, result: EnrichmentResult) -> None:
+        try:
+            note = mw.col.get_note(NoteId(job.note_id))
+        except NotFoundError:
+            # Queue belongs to the open profile, so the note was deleted.
+            return
+
+        for field_name, value in merge_fields(
+            dict(note.items()), job.base_fields, result.fields
+        ).items():
+            note[field_name] = value
+
+        if result.audio_file_name and result.audio_data and "[sound:" not in note["Front"]:
+            file_name = mw.col.media.write_data(result.audio_file_name, result.audio_data)
+            note["Front"] += f"<br>[sound:{file_name}]"
+
+        update_note(parent=mw, note=note).run_in_background()
+
+
+_worker: EnrichmentWorker | None = None
+
+
+def start_enrichment_worker() -> None:
+    global _worker
+
+    _worker = EnrichmentWorker(get_enrichment_queue(mw.pm.name))
+    _worker.start()
+
+
+def stop_enrichment_worker() -> None:
+    global _worker
+
+    if _worker:
+        _worker.stop()
+        _worker = None
+
+
+gui_hooks.profile_did_open.append(start_enrichment_worker)
+gui_hooks.profile_will_close.append(stop_enrichment_worker)
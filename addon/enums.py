@@ -16,3 +16,10 @@ class Gender(str, Enum):
     MALE = "MALE"
     FEMALE = "FEMALE"
     NEUTRAL = "NEUTRAL"
+
+
+class EnrichmentKind(str, Enum):
+    AI = "AI"
+    AUDIO = "AUDIO"
+    # Whole card, when Wiktionary was not available either.
+    CARD = "CARD"
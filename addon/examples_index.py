@@ -0,0 +1,205 @@
+"""
+Local SQLite FTS5 index of example sentences from Wiktionary "Beispiele" sections.
+
+Pages are indexed as they are fetched. A full Wiktionary dump can be indexed with:
+
+    python -m addon.examples_index dewiktionary-latest-pages-articles.xml.bz2
+
+Indexing is incremental: a page is parsed again only if its wikitext or the parser changed.
+"""
+
+import argparse
+import bz2
+import hashlib
+import os
+import re
+import sqlite3
+import xml.etree.ElementTree as ET
+from contextlib import closing
+from functools import cache
+from typing import Iterable, Iterator
+
+from . import wiktionary
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(__file__), "user_files", "examples.sqlite")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    lemma TEXT PRIMARY KEY,
+    wikitext_hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS examples (
+    id INTEGER PRIMARY KEY,
+    lemma TEXT NOT NULL,
+    sense TEXT NOT NULL,
+    sentence TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS examples_lemma ON examples (lemma);
+-- Sentences keep <b> markup for the card, it is removed before tokenization.
+CREATE VIRTUAL TABLE IF NOT EXISTS examples_fts USING fts5(
+    sentence,
+    content='examples',
+    content_rowid='id',
+    tokenize='unicode61 remove_diacritics 0'
+);
+CREATE TRIGGER IF NOT EXISTS examples_after_insert AFTER INSERT ON examples BEGIN
+    INSERT INTO examples_fts (rowid, sentence)
+    VALUES (new.id, replace(replace(new.sentence, '<b>', ''), '</b>', ''));
+END;
+CREATE TRIGGER IF NOT EXISTS examples_after_delete AFTER DELETE ON examples BEGIN
+    INSERT INTO examples_fts (examples_fts, rowid, sentence)
+    VALUES ('delete', old.id, replace(replace(old.sentence, '<b>', ''), '</b>', ''));
+END;
+"""
+
+# Pages per transaction when indexing a dump.
+BATCH_SIZE = 1000
+# Increase when example parsing changes, so already indexed pages are parsed again.
+PARSER_VERSION = 2
+
+BOLD_RE = re.compile(r"</?b>")
+
+
+class ExamplesIndex:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with closing(self._connect()) as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # New connection per call, so the index can be used from worker threads.
+        return sqlite3.connect(self.path, timeout=30)
+
+    def add_page(self, lemma: str, wikitext: str) -> bool:
+        return self.add_pages([(lemma, wikitext)]) > 0
+
+    def add_pages(self, pages: Iterable[tuple[str, str]]) -> int:
+        """
+        Index (lemma, wikitext) pages. Return the number of new or changed pages.
+        """
+        updated = 0
+        with closing(self._connect()) as connection:
+            for i, (lemma, wikitext) in enumerate(pages, start=1):
+                if self._add_page(connection, lemma, wikitext):
+                    updated += 1
+                if i % BATCH_SIZE == 0:
+                    connection.commit()
+            connection.commit()
+        return updated
+
+    def _add_page(self, connection: sqlite3.Connection, lemma: str, wikitext: str) -> bool:
+        wikitext_hash = hashlib.sha1(f"{PARSER_VERSION}:{wikitext}".encode("utf-8")).hexdigest()
+        row = connection.execute(
+            "SELECT wikitext_hash FROM pages WHERE lemma = ?", (lemma,)
+        ).fetchone()
+        if row and row[0] == wikitext_hash:
+            return False
+
+        connection.execute("DELETE FROM examples WHERE lemma = ?", (lemma,))
+        connection.executemany(
+            "INSERT INTO examples (lemma, sense, sentence) VALUES (?, ?, ?)",
+            [
+                (lemma, sense, sentence)
+                for sense, sentence in wiktionary.get_sense_examples_from_wikitext(wikitext)
+            ],
+        )
+        connection.execute(
+            "INSERT OR REPLACE INTO pages (lemma, wikitext_hash) VALUES (?, ?)",
+            (lemma, wikitext_hash),
+        )
+        return True
+
+    def find_examples(self, lemma: str, limit: int) -> list[str]:
+        """
+        Examples from the lemma page, one per sense first.
+        """
+        with closing(self._connect()) as connection:
+            rows = connection.execute(
+                """
+                SELECT sentence FROM examples
+                WHERE lemma = ?
+                ORDER BY row_number() OVER (PARTITION BY sense ORDER BY id), id
+                LIMIT ?
+                """,
+                (lemma, limit),
+            ).fetchall()
+        return [sentence for (sentence,) in rows]
+
+    def search_examples(self, lemma: str, limit: int, skip: Iterable[str] = ()) -> list[str]:
+        """
+        Full-text search of the lemma in examples from other pages. Markup of the other page
+        is replaced, so the searched word is in bold. Sentences from `skip` are not returned.
+        """
+        skip_texts = {BOLD_RE.sub("", sentence) for sentence in skip}
+        query = '"' + lemma.replace('"', '""') + '"'
+        with closing(self._connect()) as connection:
+            rows = connection.execute(
+                """
+                SELECT examples.sentence FROM examples_fts
+                JOIN examples ON examples.id = examples_fts.rowid
+                WHERE examples_fts MATCH ? AND examples.lemma != ? COLLATE NOCASE
+                ORDER BY rank
+                LIMIT ?
+                """,
+                (query, lemma, limit + len(skip_texts)),
+            ).fetchall()
+
+        word_re = re.compile(rf"\b({re.escape(lemma)})\b", re.IGNORECASE)
+        examples = []
+        for (sentence,) in rows:
+            text = BOLD_RE.sub("", sentence)
+            if text not in skip_texts:
+                examples.append(word_re.sub(r"<b>\1</b>", text))
+        return examples[:limit]
+
+
+@cache
+def get_examples_index(path: str = DEFAULT_INDEX_PATH) -> ExamplesIndex:
+    return ExamplesIndex(path)
+
+
+def iter_dump_pages(dump_path: str) -> Iterator[tuple[str, str]]:
+    """
+    Yield (title, wikitext) of main namespace pages from a MediaWiki XML dump (.xml or .xml.bz2).
+    """
+    open_dump = bz2.open if dump_path.endswith(".bz2") else open
+    with open_dump(dump_path, "rb") as f:
+        title = ""
+        namespace = ""
+        text = ""
+        context = ET.iterparse(f, events=("start", "end"))
+        _, root = next(context)
+        for event, element in context:
+            tag = element.tag.rsplit("}", 1)[-1]
+            if event == "start":
+                if tag == "page":
+                    title = namespace = text = ""
+                continue
+
+            if tag == "title":
+                title = element.text or ""
+            elif tag == "ns":
+                namespace = element.text or ""
+            elif tag == "text":
+                text = element.text or ""
+            elif tag == "page":
+                if namespace == "0" and "{{Beispiele}}" in text:
+                    yield title, text
+                # Root keeps references to all parsed pages.
+                root.clear()
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Index example sentences from a Wiktionary dump.")
+    parser.add_argument("dump_file", help="dewiktionary pages-articles dump (.xml or .xml.bz2).")
+    parser.add_argument("--index", default=DEFAULT_INDEX_PATH)
+    args = parser.parse_args(argv)
+
+    updated = ExamplesIndex(args.index).add_pages(iter_dump_pages(args.dump_file))
+    print(f"{updated} pages are indexed")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,23 @@
-import re
+import weakref
 
 import aqt.editor
+import requests
+from anki.notes import Note
 from aqt import mw
-from aqt.utils import showInfo
+from aqt.utils import showInfo, tooltip
 
 from .. import wiktionary
-from ..ai.explain_word import ExplainWordResponse, explain_word_with_ai
-from ..card_html import (
-    GENDER_TO_ARTICLE,
-    GENDER_TO_TEXT,
-    SPEACH_PART_TO_TEXT,
-    bold,
-    italic,
-)
-from ..enums import SpeachPart
+from ..ai.explain_word import AIUnavailableError, ExplainWordResponse
+from ..enrichment_queue import get_enrichment_queue
+from ..enums import EnrichmentKind
+from ..examples_index import get_examples_index
+from ..word_card import WordCardError, explain_entry, load_wiktionary_entry, render_word_card
+
+type DeferredEnrichment = tuple[str, list[EnrichmentKind], dict[str, str]]
+
+# Notes from "Add" window get id only after they are added. Notes are referenced weakly,
+# so the entry is dropped when the window is closed without adding the note.
+_deferred_enrichment_for_new_notes: dict[int, tuple[weakref.ref[Note], DeferredEnrichment]] = {}
 
 
 def insert_word_description(editor: aqt.editor.Editor) -> None:
@@ -32,148 +36,103 @@ def insert_word_description(editor: aqt.editor.Editor) -> None:
         return
 
     word = clipboard.text().strip()
-    word_to_translate = word
 
     if not word:
         showInfo("No word found in clipboard")
         return
 
-    page = wiktionary.find_word_page(word)
-    if not page:
-        showInfo(f"Page not found for word '{word}'")
+    try:
+        entry = load_wiktionary_entry(word, get_examples_index())
+    except WordCardError as e:
+        showInfo(str(e))
         return
-
-    wikitext = wiktionary.get_page_wikitext(page.page_id)
-    if not wikitext:
-        showInfo(f"No wikitext found for: {word}")
+    except requests.RequestException:
+        # No network. The whole card is generated later by the enrichment worker.
+        base_fields = {field: editor.note[field] for field in ("Front", "Info", "Example")}
+        if not editor.note["Back"].strip():
+            base_fields["Back"] = editor.note["Back"]
+        defer_enrichment(editor.note, word, [EnrichmentKind.CARD], base_fields)
+        tooltip(f"Wiktionary is not available now. Card for '{word}' will be generated later.")
         return
 
+    # Wiktionary part is rendered right away. If AI or audio is not available now,
+    # they are added to the note later by the enrichment worker.
+    deferred_kinds: list[EnrichmentKind] = []
+
+    explain_word_with_ai_response: ExplainWordResponse | None = None
+    try:
+        explain_word_with_ai_response = explain_entry(entry, config.get("GENAI_API_KEY", ""))
+    except AIUnavailableError:
+        deferred_kinds.append(EnrichmentKind.AI)
+
+    word_card = render_word_card(entry, explain_word_with_ai_response)
+
+    audio_url = None
+    audio_file_name = None
+    try:
+        audio_url = wiktionary.get_audio_url_from_wikitext(entry.wikitext)
+        if audio_url:
+            audio_file_name = mw.col.media.write_data(
+                wiktionary.get_file_name_from_url(audio_url), wiktionary.get_file_data(audio_url)
+            )
+    except requests.RequestException:
+        deferred_kinds.append(EnrichmentKind.AUDIO)
+
     # Set speech part into Info.
-    speech_part = wiktionary.get_speach_part_from_wikitext(wikitext)
-    if speech_part in SPEACH_PART_TO_TEXT:
-        editor.note["Info"] = SPEACH_PART_TO_TEXT[speech_part]
+    if word_card.info:
+        editor.note["Info"] = word_card.info
 
     editor.note["Front"] = ""
-    editor.note["Example"] = ""
+    editor.note["Example"] = word_card.example
 
-    explain_word_with_ai_response: ExplainWordResponse = explain_word_with_ai(word, speech_part)
+    # Fields which enrichment can replace, if the user does not change them.
+    base_fields = {"Example": editor.note["Example"]}
 
     # Add translation.
     if not editor.note["Back"].strip():
-        editor.note["Back"] = _generate_back(explain_word_with_ai_response)
-
-    # NOUN
-    article_text = ""
-    if speech_part == SpeachPart.NOUN:
-        # Set article.
-        gender = wiktionary.get_gender_from_wikitext(wikitext)
-        if gender:
-            article_text = GENDER_TO_TEXT[gender]
-            word_to_translate = f"{GENDER_TO_ARTICLE[gender]} {word_to_translate}"
-
-        # Set Example field.
-        plural = wiktionary.get_plural_from_wikitext(wikitext)
-        genitive = wiktionary.get_genitive_from_wikitext(wikitext)
-        editor.note["Example"] = (
-            f'<span class="plural-label">plural:</span>'
-            f'&nbsp;<span class="plural-value">{plural or "-"}</span>'
-            f'&nbsp;<span class="genitive-label">genitive:</span>'
-            f'&nbsp;<span class="genitive-value">{genitive}</span>'
-        )
-
-    if speech_part == SpeachPart.VERB:
-        # Add word forms.
-        prateritum = wiktionary.get_prateritum_from_wikitext(wikitext)
-        partizip2 = wiktionary.get_partizip2_from_wikitext(wikitext)
-        editor.note["Example"] = (
-            f'<span class="prateritum-label">Präteritum:</span>'
-            f'&nbsp;<span class="prateritum-value">{prateritum}</span>'
-            f'&nbsp;<span class="partizip2-label">Partizip II:</span>'
-            f'&nbsp;<span class="partizip2-value">{partizip2}</span>'
-        )
-
-        # Add help verb.
-        help_verb = wiktionary.get_help_verb_from_wikitext(wikitext)
-        if help_verb == "sein":
-            editor.note["Example"] += (
-                f'&nbsp;<span class="hilfsverb-label">Hilfsverb:</span>'
-                f'&nbsp;<span class="hilfsverb-value">{help_verb}</span>'
-            )
-
-    if explain_word_with_ai_response.additional_context:
-        editor.note["Example"] += (
-            f"<br><br>{italic(explain_word_with_ai_response.additional_context)}"
-        )
-
-    # Add examples.
-    editor.note["Example"] += '<ul class="examples">'
-    for usage_example in explain_word_with_ai_response.usage_examples:
-        editor.note["Example"] += f"<li>{usage_example}</li>"
-    editor.note["Example"] += "</ul>"
-
-    # Add synonyms.
-    if explain_word_with_ai_response.synonyms:
-        editor.note["Example"] += (
-            '<span class="synonyms-label">Синоніми:</span><ul class="synonyms-list">'
-        )
-        for synonym in explain_word_with_ai_response.synonyms:
-            editor.note["Example"] += (
-                f"<li>{bold(synonym.word)} - {italic(synonym.difference)}</li>"
-            )
-        editor.note["Example"] += "</ul>"
-
-    # Add additional info.
-    if explain_word_with_ai_response.additional_info:
-        editor.note["Example"] += (
-            '<span class="additional-info-label">Додаткова інформація:</span>'
-            '<ul class="additional-info-list">'
-        )
-        for info in explain_word_with_ai_response.additional_info:
-            editor.note["Example"] += f"<li>{info}</li>"
-        editor.note["Example"] += "</ul>"
-
-    # Add Wiktionary URL.
-    editor.note["Example"] += f'<a href="{page.full_url}">{page.full_url}</a>'
+        editor.note["Back"] = word_card.back
+        base_fields["Back"] = word_card.back
 
     editor.set_note(editor.note)
 
-    # Load IPA
-    ipa = wiktionary.get_ipa_from_wikitext(wikitext)
-
     # Insert word
-    html = f"<h2>{article_text}{word.strip()}</h2>[{ipa}]"
-    editor.web.eval(f"setFormat('insertHTML', '{html}')")
+    editor.web.eval(f"setFormat('insertHTML', '{word_card.front}')")
 
     # Insert audio
-    audio_url = wiktionary.get_audio_url_from_wikitext(wikitext)
-    if audio_url:
-        audio_url = f"\n{audio_url}"
-        clipboard.setText(audio_url)
-        # Trigger audio paste, so Anki can replace with proper tag.
-        editor.onPaste()
-        clipboard.setText(word)
-    else:
+    if audio_file_name:
+        editor.web.eval(f"setFormat('insertHTML', '<br>[sound:{audio_file_name}]')")
+    elif EnrichmentKind.AUDIO not in deferred_kinds:
         showInfo(f"Audio file was not found for: {word}")
 
+    if deferred_kinds:
+        defer_enrichment(editor.note, word, deferred_kinds, base_fields)
+        tooltip(f"AI or audio is not available now. It will be added to '{word}' later.")
+
     # Get selected text.
     # def callback(*args, **kwargs):
     #     print(args, kwargs)
     # editor.web.evalWithCallback("window.getSelection().toString()", callback)
 
 
-def _generate_back(explain_word_with_ai_response: ExplainWordResponse) -> str:
-    back = _format_text_with_parentheses(explain_word_with_ai_response.ukrainian_translation)
-    return back
-
+def defer_enrichment(
+    note: Note, word: str, kinds: list[EnrichmentKind], base_fields: dict[str, str]
+) -> None:
+    if not note.id:
+        key = id(note)
+        _deferred_enrichment_for_new_notes[key] = (
+            weakref.ref(note, lambda _: _deferred_enrichment_for_new_notes.pop(key, None)),
+            (word, kinds, base_fields),
+        )
+        return
 
-def _format_text_with_parentheses(text: str) -> str:
-    parts = re.split(r"(\([^)]+\))", text)
+    enrichment_queue = get_enrichment_queue(mw.pm.name)
+    for kind in kinds:
+        enrichment_queue.add(note.id, word, kind, base_fields)
 
-    result = []
-    for part in parts:
-        if part.startswith("("):
-            result.append(part)
-        elif part.strip():
-            result.append(bold(part))
 
-    return "".join(result)
+def defer_enrichment_for_added_note(note: Note) -> None:
+    deferred = _deferred_enrichment_for_new_notes.pop(id(note), None)
+    if deferred is None or deferred[0]() is not note:
+        return
+    word, kinds, base_fields = deferred[1]
+    defer_enrichment(note, word, kinds, base_fields)
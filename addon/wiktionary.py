@@ -1,4 +1,5 @@
 import re
+import urllib.parse
 from dataclasses import dataclass
 
 import requests
@@ -9,6 +10,7 @@ from .enums import Gender, SpeachPart
 @dataclass
 class Page:
     page_id: int
+    title: str
     full_url: str
 
 
@@ -34,6 +36,7 @@ def find_word_page(word: str) -> Page | None:
 
     return Page(
         page_id=page_item["pageid"],
+        title=page_item["title"],
         full_url=page_item["fullurl"],
     )
 
@@ -190,11 +193,22 @@ def get_genitive_from_wikitext(wikitext: str) -> str | None:
     return matches[0].group("genitive")
 
 
-REF_RE = re.compile(r"<ref[^>]*>.*?</ref>")
+REF_RE = re.compile(r"<ref[^>]*/>|<ref[^>]*>.*?</ref>")
+TEMPLATE_RE = re.compile(r"\{\{[^{}]*\}\}")
+# [[target|text]] or [[target]] -> text.
+WIKILINK_RE = re.compile(r"\[\[(?:[^|\]]*\|)?(?P<text>[^\]]*)\]\]")
 EXAMPLE_RE = re.compile(r"\{\{Beispiele\}\}(?P<examples>.*?)\n\{\{[^{]+\}\}", re.DOTALL)
+SENSE_RE = re.compile(r":\[(?P<sense>[\w ,–]+)\]")
 
 
 def get_examples_from_wikitext(wikitext: str) -> list[str]:
+    return [example for _, example in get_sense_examples_from_wikitext(wikitext)][:5]
+
+
+def get_sense_examples_from_wikitext(wikitext: str) -> list[tuple[str, str]]:
+    """
+    Return (sense, example) pairs. Sense is the meaning number from Wiktionary, e.g. "1" or "2, 3".
+    """
     match = EXAMPLE_RE.search(wikitext)
     if not match:
         return []
@@ -203,18 +217,24 @@ def get_examples_from_wikitext(wikitext: str) -> list[str]:
 
     output = []
     for example in examples:
-        example = re.sub(r":\[[\w ,–]+\]", "", example)
+        sense_match = SENSE_RE.search(example)
+        sense = sense_match.group("sense") if sense_match else ""
+        example = SENSE_RE.sub("", example)
         example = example.replace("\n", "")
         example = REF_RE.sub("", example)
+        # Remove nested templates from inside out.
+        while TEMPLATE_RE.search(example):
+            example = TEMPLATE_RE.sub("", example)
+        example = WIKILINK_RE.sub(r"\g<text>", example)
         example = example.strip()
         example = example.strip("„“=\n»«")
         if not example or example.startswith("::Anneliese") or len(example) > 150:
             continue
 
         example = re.sub(r"''(.*?)''", r"<b>\1</b>", example)
-        output.append(example)
+        output.append((sense, example))
 
-    return output[:5]
+    return output
 
 
 HELP_VERB_RE = re.compile(r"Hilfsverb=(?P<help_verb>\w+)")
@@ -245,3 +265,18 @@ def get_partizip2_from_wikitext(wikitext: str) -> str | None:
     if not matches:
         return None
     return matches[0].group("partizip2")
+
+
+def get_file_name_from_url(url: str) -> str:
+    return urllib.parse.unquote(url.rsplit("/", 1)[-1])
+
+
+def get_file_data(url: str) -> bytes:
+    response = requests.get(url, headers=HEADERS)
+    response.raise_for_status()
+    return response.content
+
+
+def download_file(url: str, file_path: str) -> None:
+    with open(file_path, "wb") as f:
+        f.write(get_file_data(url))
@@ -0,0 +1,227 @@
+"""
+Word -> card fields pipeline. Does not depend on `aqt`, so it is shared by the editor
+shortcut and the headless CLI.
+"""
+
+import re
+from dataclasses import dataclass
+
+from . import wiktionary
+from .ai.explain_word import ExplainWordResponse, explain_word_with_ai
+from .card_html import (
+    GENDER_TO_TEXT,
+    SPEACH_PART_TO_TEXT,
+    bold,
+    italic,
+)
+from .enums import SpeachPart
+from .examples_index import ExamplesIndex
+
+LOCAL_EXAMPLES_LIMIT = 5
+# Ask AI for examples only if the lemma page has fewer.
+MIN_LOCAL_EXAMPLES = 3
+
+
+class WordCardError(Exception):
+    pass
+
+
+@dataclass
+class WordCard:
+    word: str
+    front: str
+    back: str
+    info: str | None
+    example: str
+    audio_url: str | None = None
+
+
+@dataclass
+class WiktionaryEntry:
+    word: str
+    page: wiktionary.Page
+    wikitext: str
+    speech_part: SpeachPart | None
+    # Examples from the word page.
+    local_examples: list[str]
+    # Examples with the word from other pages. Only used if the word page has too few.
+    related_examples: list[str]
+
+
+def build_word_card(
+    word: str, genai_api_key: str, examples_index: ExamplesIndex | None = None
+) -> WordCard:
+    entry = load_wiktionary_entry(word, examples_index)
+    word_card = render_word_card(entry, explain_entry(entry, genai_api_key))
+    word_card.audio_url = wiktionary.get_audio_url_from_wikitext(entry.wikitext)
+    return word_card
+
+
+def load_wiktionary_entry(
+    word: str, examples_index: ExamplesIndex | None = None
+) -> WiktionaryEntry:
+    page = wiktionary.find_word_page(word)
+    if not page:
+        raise WordCardError(f"Page not found for word '{word}'")
+
+    wikitext = wiktionary.get_page_wikitext(page.page_id)
+    if not wikitext:
+        raise WordCardError(f"No wikitext found for: {word}")
+
+    local_examples: list[str] = []
+    related_examples: list[str] = []
+    if examples_index:
+        # Page title is used as lemma, the same as in dumps.
+        examples_index.add_page(page.title, wikitext)
+        local_examples = examples_index.find_examples(page.title, LOCAL_EXAMPLES_LIMIT)
+        if len(local_examples) < MIN_LOCAL_EXAMPLES:
+            related_examples = examples_index.search_examples(
+                page.title, MIN_LOCAL_EXAMPLES - len(local_examples), skip=local_examples
+            )
+
+    return WiktionaryEntry(
+        word=word.strip(),
+        page=page,
+        wikitext=wikitext,
+        speech_part=wiktionary.get_speach_part_from_wikitext(wikitext),
+        local_examples=local_examples,
+        related_examples=related_examples,
+    )
+
+
+def explain_entry(entry: WiktionaryEntry, genai_api_key: str) -> ExplainWordResponse:
+    return explain_word_with_ai(
+        entry.word,
+        entry.speech_part,
+        genai_api_key,
+        usage_examples_needed=len(entry.local_examples) < MIN_LOCAL_EXAMPLES,
+    )
+
+
+def render_word_card(
+    entry: WiktionaryEntry, explain_word_with_ai_response: ExplainWordResponse | None
+) -> WordCard:
+    """
+    Without AI response only the Wiktionary part of the card is rendered.
+    """
+    word = entry.word
+    wikitext = entry.wikitext
+    speech_part = entry.speech_part
+    example = ""
+
+    # NOUN
+    article_text = ""
+    if speech_part == SpeachPart.NOUN:
+        # Set article.
+        gender = wiktionary.get_gender_from_wikitext(wikitext)
+        if gender:
+            article_text = GENDER_TO_TEXT[gender]
+
+        # Set Example field.
+        plural = wiktionary.get_plural_from_wikitext(wikitext)
+        genitive = wiktionary.get_genitive_from_wikitext(wikitext)
+        example = (
+            f'<span class="plural-label">plural:</span>'
+            f'&nbsp;<span class="plural-value">{plural or "-"}</span>'
+            f'&nbsp;<span class="genitive-label">genitive:</span>'
+            f'&nbsp;<span class="genitive-value">{genitive}</span>'
+        )
+
+    if speech_part == SpeachPart.VERB:
+        # Add word forms.
+        prateritum = wiktionary.get_prateritum_from_wikitext(wikitext)
+        partizip2 = wiktionary.get_partizip2_from_wikitext(wikitext)
+        example = (
+            f'<span class="prateritum-label">Präteritum:</span>'
+            f'&nbsp;<span class="prateritum-value">{prateritum}</span>'
+            f'&nbsp;<span class="partizip2-label">Partizip II:</span>'
+            f'&nbsp;<span class="partizip2-value">{partizip2}</span>'
+        )
+
+        # Add help verb.
+        help_verb = wiktionary.get_help_verb_from_wikitext(wikitext)
+        if help_verb == "sein":
+            example += (
+                f'&nbsp;<span class="hilfsverb-label">Hilfsverb:</span>'
+                f'&nbsp;<span class="hilfsverb-value">{help_verb}</span>'
+            )
+
+    usage_examples = list(entry.local_examples)
+    if explain_word_with_ai_response:
+        if explain_word_with_ai_response.additional_context:
+            example += f"<br><br>{italic(explain_word_with_ai_response.additional_context)}"
+        usage_examples += explain_word_with_ai_response.usage_examples
+
+    # Add examples. Local examples from Wiktionary go first.
+    example += '<ul class="examples">'
+    for usage_example in usage_examples:
+        example += f"<li>{usage_example}</li>"
+    example += "</ul>"
+
+    # Examples from other Wiktionary pages are shown separately, they can use another meaning.
+    if entry.related_examples:
+        example += (
+            '<span class="related-examples-label">Приклади з інших статей:</span>'
+            '<ul class="related-examples-list">'
+        )
+        for related_example in entry.related_examples:
+            example += f"<li>{related_example}</li>"
+        example += "</ul>"
+
+    if explain_word_with_ai_response:
+        example += _generate_ai_info(explain_word_with_ai_response)
+
+    # Add Wiktionary URL.
+    example += f'<a href="{entry.page.full_url}">{entry.page.full_url}</a>'
+
+    # Load IPA
+    ipa = wiktionary.get_ipa_from_wikitext(wikitext)
+
+    return WordCard(
+        word=word,
+        front=f"<h2>{article_text}{word}</h2>[{ipa}]",
+        back=_generate_back(explain_word_with_ai_response) if explain_word_with_ai_response else "",
+        info=SPEACH_PART_TO_TEXT.get(speech_part) if speech_part else None,
+        example=example,
+    )
+
+
+def _generate_ai_info(explain_word_with_ai_response: ExplainWordResponse) -> str:
+    html = ""
+
+    # Add synonyms.
+    if explain_word_with_ai_response.synonyms:
+        html += '<span class="synonyms-label">Синоніми:</span><ul class="synonyms-list">'
+        for synonym in explain_word_with_ai_response.synonyms:
+            html += f"<li>{bold(synonym.word)} - {italic(synonym.difference)}</li>"
+        html += "</ul>"
+
+    # Add additional info.
+    if explain_word_with_ai_response.additional_info:
+        html += (
+            '<span class="additional-info-label">Додаткова інформація:</span>'
+            '<ul class="additional-info-list">'
+        )
+        for info in explain_word_with_ai_response.additional_info:
+            html += f"<li>{info}</li>"
+        html += "</ul>"
+
+    return html
+
+
+def _generate_back(explain_word_with_ai_response: ExplainWordResponse) -> str:
+    back = _format_text_with_parentheses(explain_word_with_ai_response.ukrainian_translation)
+    return back
+
+
+def _format_text_with_parentheses(text: str) -> str:
+    parts = re.split(r"(\([^)]+\))", text)
+
+    result = []
+    for part in parts:
+        if part.startswith("("):
+            result.append(part)
+        elif part.strip():
+            result.append(bold(part))
+
+    return "".join(result)